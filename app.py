@@ -1,10 +1,19 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
+import asyncio
+import hashlib
+import re
+import time
+import diskcache
+import numpy as np
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import TranscriptsDisabled, VideoUnavailable
 import logging
+from itertools import chain
+from operator import itemgetter
 
 # Load environment variables
 load_dotenv()
@@ -17,38 +26,303 @@ prompt = """You are a YouTube video summarizer. You will take the transcript tex
 and summarize the entire video, providing the important points in a summary within 250 words.
 Please summarize the following text: """
 
+# Prompt used to condense each chunk of a long transcript before the final summary
+chunk_prompt = """You are a YouTube video summarizer. You will take a part of a video transcript
+and condense it, keeping every important point within {words} words.
+Please condense the following text: """
+
+# Long transcripts are summarized chunk by chunk (map-reduce) instead of being sent whole
+TRANSCRIPT_MAX_CHARS = 24000
+TRANSCRIPT_CHUNK_CHARS = 8000
+CHUNK_MIN_WORDS = 50
+CHUNK_MAX_WORDS = 300
+CHARS_PER_WORD = 6
+CHUNK_CONCURRENCY = 4
+CHUNK_RETRIES = 3
+CONDENSE_MAX_ROUNDS = 3
+# Rate limits and server-side hiccups are worth retrying; anything else (e.g. a blocked chunk) is not
+TRANSIENT_API_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+# Matches the video ID in watch, youtu.be, shorts, embed and live URLs
+VIDEO_ID_RE = re.compile(r"(?:[?&]v=|youtu\.be/|/(?:shorts|embed|live)/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
-# Function to extract transcript details
-def extract_transcript_details(youtube_video_url):
+# Summaries are cached on disk so the same transcript is never sent to Gemini twice
+SUMMARY_CACHE_DIR = "./.gemini_cache"
+SUMMARY_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days
+
+@st.cache_resource
+def get_summary_cache():
+    return diskcache.Cache(SUMMARY_CACHE_DIR)
+
+def summary_cache_key(transcript_text, prompt):
+    return hashlib.blake2b((prompt + "\x00" + transcript_text).encode(), digest_size=16).hexdigest()
+
+# Cache failures are logged and treated as a miss so they never cost the user a summary
+def summary_cache_get(key):
+    try:
+        return get_summary_cache().get(key)
+    except Exception as e:
+        logging.error("Error reading summary cache: %s", e)
+        return None
+
+def summary_cache_set(key, summary, expire=SUMMARY_CACHE_TTL):
+    try:
+        get_summary_cache().set(key, summary, expire=expire)
+    except Exception as e:
+        logging.error("Error writing summary cache: %s", e)
+
+# Near-duplicate transcripts (re-uploads, trimmed cuts) reuse a summary via embedding similarity
+EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_MAX_CHARS = 8000
+EMBEDDING_MAX_CHUNKS = 100
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_LENGTH_RATIO = 0.05
+SEMANTIC_CACHE_MAX_ENTRIES = 512
+
+# Embed the transcript chunk by chunk; returns one normalized vector per chunk
+def embed_transcript(transcript_text):
+    chunks = split_transcript(transcript_text, EMBEDDING_MAX_CHARS)
+    if not chunks or len(chunks) > EMBEDDING_MAX_CHUNKS:
+        return None
+    try:
+        result = genai.embed_content(model=EMBEDDING_MODEL, content=chunks)
+        vectors = np.asarray(result["embedding"], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    except Exception as e:
+        logging.error("Error embedding transcript: %s", e)
+        return None
+
+# The index holds (created_at, n_chunks, length, summary) per entry; chunk vectors live under their own keys
+def semantic_cache_keys(prompt):
+    prompt_key = summary_cache_key("", prompt)
+    return ("semantic_entries", prompt_key), ("semantic_lru", prompt_key)
+
+def semantic_vectors_key(entry_key):
+    return ("semantic_vectors", entry_key)
+
+# A hit needs the same chunk count, a similar length and every aligned chunk pair above the threshold.
+# Returns (summary, seconds until the matched entry expires), or None on a miss
+def semantic_cache_lookup(cache, prompt, vectors, length):
+    index_key, lru_key = semantic_cache_keys(prompt)
+    now = time.time()
+    entries = cache.get(index_key, {})
+    best_key, best_score = None, SEMANTIC_CACHE_THRESHOLD
+    for entry_key, (created_at, n_chunks, entry_length, _) in entries.items():
+        if now - created_at >= SUMMARY_CACHE_TTL or n_chunks != len(vectors):
+            continue
+        if abs(entry_length - length) > SEMANTIC_CACHE_MAX_LENGTH_RATIO * max(entry_length, length):
+            continue
+        entry_vectors = cache.get(semantic_vectors_key(entry_key))
+        if entry_vectors is None or entry_vectors.shape != vectors.shape:
+            continue
+        score = float(np.min(np.sum(entry_vectors * vectors, axis=1)))
+        if score >= best_score:
+            best_key, best_score = entry_key, score
+    if best_key is None:
+        return None
+
+    created_at, _, _, summary = entries[best_key]
+    # Recency lives in its own small key so a hit never rewrites the index
+    with cache.transact():
+        last_used = cache.get(lru_key, {})
+        last_used[best_key] = now
+        cache.set(lru_key, last_used, expire=SUMMARY_CACHE_TTL)
+    return summary, created_at + SUMMARY_CACHE_TTL - now
+
+def semantic_cache_store(cache, prompt, key, vectors, length, summary):
+    index_key, lru_key = semantic_cache_keys(prompt)
+    now = time.time()
+    with cache.transact():
+        stored = cache.get(index_key, {})
+        entries = {
+            entry_key: entry for entry_key, entry in stored.items()
+            if now - entry[0] < SUMMARY_CACHE_TTL
+        }
+        last_used = cache.get(lru_key, {})
+        entries[key] = (now, len(vectors), length, summary)
+        last_used[key] = now
+        cache.set(semantic_vectors_key(key), vectors, expire=SUMMARY_CACHE_TTL)
+        if len(entries) > SEMANTIC_CACHE_MAX_ENTRIES:
+            recent = sorted(entries, key=lambda k: last_used.get(k, entries[k][0]), reverse=True)
+            entries = {entry_key: entries[entry_key] for entry_key in recent[:SEMANTIC_CACHE_MAX_ENTRIES]}
+        for entry_key in stored.keys() - entries.keys():
+            cache.delete(semantic_vectors_key(entry_key))
+        last_used = {entry_key: t for entry_key, t in last_used.items() if entry_key in entries}
+        cache.set(index_key, entries, expire=SUMMARY_CACHE_TTL)
+        cache.set(lru_key, last_used, expire=SUMMARY_CACHE_TTL)
+
+# Transcripts are immutable per video, so they are cached in memory and on disk
+TRANSCRIPT_CACHE_DIR = "./.transcript_cache"
+TRANSCRIPT_CACHE_TTL = int(os.getenv("TRANSCRIPT_CACHE_TTL", 7 * 24 * 60 * 60))  # 7 days
+
+@st.cache_resource
+def get_transcript_cache():
+    return diskcache.Cache(TRANSCRIPT_CACHE_DIR)
+
+@st.cache_data(max_entries=1024, ttl=TRANSCRIPT_CACHE_TTL, show_spinner=False)
+def fetch_transcript(video_id, lang="en"):
     try:
-        video_id = youtube_video_url.split("=")[1]
-        transcript_data = YouTubeTranscriptApi.get_transcript(video_id)
-        
-        # Combine transcript text
-        transcript = " ".join([entry["text"] for entry in transcript_data])
+        transcript = get_transcript_cache().get((video_id, lang))
+    except Exception as e:
+        logging.error("Error reading transcript cache: %s", e)
+        transcript = None
+    if transcript is not None:
         return transcript
 
+    transcript_data = YouTubeTranscriptApi.get_transcript(video_id, languages=[lang])
+
+    # Combine transcript text
+    transcript = " ".join(map(itemgetter("text"), transcript_data))
+    try:
+        get_transcript_cache().set((video_id, lang), transcript, expire=TRANSCRIPT_CACHE_TTL)
+    except Exception as e:
+        logging.error("Error writing transcript cache: %s", e)
+    return transcript
+
+# Function to extract the video ID from a YouTube link
+def extract_video_id(youtube_video_url):
+    match = VIDEO_ID_RE.search(youtube_video_url)
+    return match.group(1) if match else None
+
+# Function to extract transcript details
+def extract_transcript_details(video_id):
+    try:
+        return fetch_transcript(video_id)
+
     except TranscriptsDisabled:
         st.error("Transcripts are disabled for this video. Please try another video.")
-        logging.error("Transcripts are disabled for video ID: %s", youtube_video_url.split("=")[1])
+        logging.error("Transcripts are disabled for video ID: %s", video_id)
     except VideoUnavailable:
         st.error("The video is unavailable or does not exist. Please check the link.")
-        logging.error("Video unavailable for URL: %s", youtube_video_url)
+        logging.error("Video unavailable for video ID: %s", video_id)
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
         logging.error("Unexpected error: %s", e)
 
     return None
 
-# Function to generate summary using Gemini
-def generate_gemini_content(transcript_text, prompt):
+@st.cache_resource
+def get_model(name="gemini-pro"):
+    return genai.GenerativeModel(name)
+
+# Last-resort guard; condense_transcript should already have brought the text under the limit
+def truncate_transcript(transcript_text, max_chars=TRANSCRIPT_MAX_CHARS):
+    if len(transcript_text) > max_chars:
+        logging.warning("Truncating transcript from %d to %d chars", len(transcript_text), max_chars)
+    return transcript_text[:max_chars]
+
+# Split into chunks of at most chunk_chars, cutting at the last whitespace so words stay whole
+def split_transcript(transcript_text, chunk_chars=TRANSCRIPT_CHUNK_CHARS):
+    chunks = []
+    start = 0
+    while start < len(transcript_text):
+        end = start + chunk_chars
+        if end < len(transcript_text):
+            cut = max(transcript_text.rfind(" ", start, end), transcript_text.rfind("\n", start, end))
+            if cut > start:
+                end = cut
+        chunk = transcript_text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+# Size each partial summary so all of them together fit in the final prompt
+def chunk_word_budget(n_chunks):
+    words = TRANSCRIPT_MAX_CHARS // (n_chunks * CHARS_PER_WORD)
+    return max(CHUNK_MIN_WORDS, min(CHUNK_MAX_WORDS, words))
+
+# Returns the condensed chunk, or None if it keeps failing so one bad chunk cannot sink a long video
+async def condense_chunk(model, chunk, words, semaphore):
+    for attempt in range(CHUNK_RETRIES):
+        try:
+            async with semaphore:
+                response = await asyncio.to_thread(model.generate_content, chunk_prompt.format(words=words) + chunk)
+            return response.text
+        except TRANSIENT_API_ERRORS as e:
+            logging.warning("Chunk condensation failed (attempt %d of %d): %s", attempt + 1, CHUNK_RETRIES, e)
+            if attempt < CHUNK_RETRIES - 1:
+                await asyncio.sleep(2 ** attempt)
+        except Exception as e:
+            logging.warning("Skipping chunk that could not be condensed: %s", e)
+            return None
+    logging.warning("Skipping chunk after %d failed attempts", CHUNK_RETRIES)
+    return None
+
+# Condense chunks in parallel (at most CHUNK_CONCURRENCY requests at once), repeating until the text fits
+async def condense_transcript(model, transcript_text):
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+    for _ in range(CONDENSE_MAX_ROUNDS):
+        if len(transcript_text) <= TRANSCRIPT_MAX_CHARS:
+            break
+        chunks = split_transcript(transcript_text)
+        words = chunk_word_budget(len(chunks))
+        partials = await asyncio.gather(*(condense_chunk(model, chunk, words, semaphore) for chunk in chunks))
+        partials = [partial for partial in partials if partial]
+        if not partials:
+            raise RuntimeError("No part of the transcript could be condensed")
+        transcript_text = " ".join(partials)
+    return transcript_text
+
+# Function to generate summary using Gemini, streaming partial output into placeholder if given
+def generate_gemini_content(transcript_text, prompt, placeholder=None):
+    key = summary_cache_key(transcript_text, prompt)
+    summary = summary_cache_get(key)
+    if summary is not None:
+        logging.info("Summary cache hit: %s", key)
+        return summary
+
+    # The transcript is condensed in place below, so keep the original length for the semantic index
+    transcript_length = len(transcript_text)
+    hit = None
+    with st.spinner("Checking for a previously summarized video..."):
+        vectors = embed_transcript(transcript_text)
+        if vectors is not None:
+            try:
+                hit = semantic_cache_lookup(get_summary_cache(), prompt, vectors, transcript_length)
+            except Exception as e:
+                logging.error("Error in semantic cache lookup: %s", e)
+    if hit is not None:
+        summary, expire = hit
+        logging.info("Semantic summary cache hit: %s", key)
+        summary_cache_set(key, summary, expire=expire)
+        return summary
+
     try:
-        model = genai.GenerativeModel("gemini-pro")
-        response = model.generate_content(prompt + transcript_text)
-        return response.text
+        model = get_model()
+        # Keep a spinner up until the first streamed chunk is ready to render
+        with st.spinner("Generating detailed notes..."):
+            if len(transcript_text) > TRANSCRIPT_MAX_CHARS:
+                transcript_text = asyncio.run(condense_transcript(model, transcript_text))
+            response = iter(model.generate_content(prompt + truncate_transcript(transcript_text), stream=True))
+            first_chunk = next(response)
+
+        chunks = []
+        for chunk in chain([first_chunk], response):
+            chunks.append(chunk.text)
+            if placeholder is not None:
+                placeholder.markdown("".join(chunks))
+        summary = "".join(chunks)
+
+        summary_cache_set(key, summary)
+        if vectors is not None:
+            try:
+                semantic_cache_store(get_summary_cache(), prompt, key, vectors, transcript_length, summary)
+            except Exception as e:
+                logging.error("Error in semantic cache store: %s", e)
+        return summary
     except Exception as e:
+        if placeholder is not None:
+            placeholder.empty()
         st.error("An error occurred while generating the summary. Please try again.")
         logging.error("Error in Gemini content generation: %s", e)
         return None
@@ -57,18 +331,24 @@ def generate_gemini_content(transcript_text, prompt):
 st.title("YouTube Transcript to Detailed Notes Converter")
 youtube_link = st.text_input("Enter YouTube Video Link:")
 
+video_id = extract_video_id(youtube_link) if youtube_link else None
+
 if youtube_link:
-    try:
-        video_id = youtube_link.split("=")[1]
+    if video_id:
         st.image(f"http://img.youtube.com/vi/{video_id}/0.jpg", use_column_width=True)
-    except IndexError:
+    else:
         st.error("Invalid YouTube link. Please provide a valid URL.")
 
-if st.button("Get Detailed Notes"):
-    transcript_text = extract_transcript_details(youtube_link)
+if st.button("Get Detailed Notes") and video_id:
+    transcript_text = extract_transcript_details(video_id)
 
     if transcript_text:
-        summary = generate_gemini_content(transcript_text, prompt)
-        if summary:
+        output = st.empty()
+        with output.container():
             st.markdown("## Detailed Notes:")
-            st.write(summary)
+            placeholder = st.empty()
+        summary = generate_gemini_content(transcript_text, prompt, placeholder)
+        if summary:
+            placeholder.write(summary)
+        else:
+            output.empty()